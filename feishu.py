@@ -2,15 +2,38 @@
 import os
 import requests
 import logging
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 所有飞书通知共用一个 session：复用连接，失败按指数退避重试
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(max_retries=Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=["POST"]
+)))
 
 def get_webhook(config: dict) -> str:
     # Actions secrets 覆盖 config
     return os.getenv("FEISHU_WEBHOOK") or (config.get("feishu", {}) or {}).get("webhook_url", "")
 
-def notify_candidates(config: dict, title: str, candidates: list, max_items=10):
+def post_card(webhook: str, card: dict) -> bool:
+    try:
+        r = _session.post(webhook, json=card, timeout=10)
+        r.raise_for_status()
+        return True
+    except Exception as e:
+        logging.error(f"Feishu send failed: {e}")
+        return False
+
+def notify_candidates(config: dict, title: str, candidates: list, max_items=10) -> bool:
+    """返回是否已处理完：没有候选视为完成；没配 webhook 或发送失败返回 False"""
+    if not candidates:
+        return True
     webhook = get_webhook(config)
-    if not webhook or not candidates:
-        return
+    if not webhook:
+        return False
 
     show = candidates[:max_items]
     lines = []
@@ -32,11 +55,7 @@ def notify_candidates(config: dict, title: str, candidates: list, max_items=10):
         }
     }
 
-    for attempt in range(3):
-        try:
-            r = requests.post(webhook, json=card, timeout=10)
-            r.raise_for_status()
-            logging.info("Feishu candidates sent.")
-            return
-        except Exception as e:
-            logging.error(f"Feishu send failed: {e}")
+    if not post_card(webhook, card):
+        return False
+    logging.info("Feishu candidates sent.")
+    return True
@@ -1,13 +1,30 @@
 import os
+import re
 import requests
 import cloudscraper
 import yaml
-import gzip
+import io
 import logging
+import shutil
+from collections import Counter
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 from urllib.parse import urlsplit, urlunsplit
-from bs4 import BeautifulSoup
+from lxml import etree
+from requests.adapters import HTTPAdapter
+
+from feishu import notify_candidates, post_card
+from signals import build_signal_candidates
+from sources.reddit_rss import fetch_reddit_items_with_state, load_feed_state, save_feed_state
+from sources.youtube_rss import fetch_youtube_items
+
+try:
+    # ISA-L 的 SIMD 解压，接口与标准库 gzip 一致
+    from isal import igzip as gzip
+except ImportError:
+    import gzip
 
 # ================= 基础设置 =================
 logging.basicConfig(
@@ -44,13 +61,15 @@ EXCLUDE_KEYWORDS = [
     "/search", "/sitemap", "/wp-",
 ]
 
+# 黑名单编成一个正则，一次 search 扫完所有关键词
+_EXCLUDE_RE = re.compile("|".join(map(re.escape, EXCLUDE_KEYWORDS)))
+
 def is_valid_game_url(url: str) -> bool:
     u = url.lower()
 
     # 黑名单关键词
-    for k in EXCLUDE_KEYWORDS:
-        if k in u:
-            return False
+    if _EXCLUDE_RE.search(u):
+        return False
 
     # 必须是 http(s)
     if not u.startswith("http"):
@@ -63,53 +82,146 @@ def is_valid_game_url(url: str) -> bool:
     return True
 
 # ================= Sitemap 处理 =================
-def process_sitemap(url):
+# 并发抓取的线程数上限
+MAX_WORKERS = 16
+
+# 流式读取 / 解压时的缓冲大小
+READ_BUFFER_SIZE = 128 * 1024
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+SITEMAP_TAGS = (b"<urlset", b"<sitemapindex")
+
+# 普通站点走原生 requests 连接池，省掉 cloudscraper 的挑战检测开销；
+# 配置了 needs_cloudscraper 或被 Cloudflare 拦下的才用 scraper
+scraper = cloudscraper.create_scraper()
+
+session = requests.Session()
+# 沿用 cloudscraper 的浏览器 UA，避免被按 python-requests UA 拦截（429/406/404 等不会触发回退）
+session.headers["User-Agent"] = scraper.headers["User-Agent"]
+_adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+session.mount("https://", _adapter)
+session.mount("http://", _adapter)
+
+# 这些状态码通常是 Cloudflare 的挑战页，换 cloudscraper 再试一次
+CHALLENGE_STATUS = (403, 503)
+
+class ChunkStream(io.RawIOBase):
+    """
+    把 iter_content 的分块迭代器包装成只读文件对象，
+    这样 gzip / lxml 可以直接边下载边消费
+    """
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buf = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buf:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buf = chunk
+
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+def read_head(stream, size, markers=()):
+    """
+    从流开头读出最多 size 字节用来判定格式（读到 EOF 或已出现 markers 时提前停），
+    返回 (head, 接回 head 之后的完整流)
+    BufferedReader.peek 只做一次底层读取，分块传输时拿到的可能只是第一块，所以这里循环读
+    """
+    head = b""
+    while len(head) < size and not any(m in head for m in markers):
+        chunk = stream.read1(size - len(head))
+        if not chunk:
+            break
+        head += chunk
+
+    rest = iter(lambda: stream.read1(READ_BUFFER_SIZE), b"")
+    return head, io.BufferedReader(ChunkStream(chain([head], rest)), buffer_size=READ_BUFFER_SIZE)
+
+def is_xml_sitemap(head):
+    if any(m in head for m in SITEMAP_TAGS):
+        return True
+    # 根标签不在开头一段里（比如前面有很长的注释）时，按是否以 < 开头判断
+    return head.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"<")
+
+def open_sitemap(url, needs_cloudscraper=False):
+    if not needs_cloudscraper:
+        resp = session.get(url, stream=True, timeout=20)
+        if resp.status_code not in CHALLENGE_STATUS:
+            return resp
+
+        resp.close()
+        logging.info(f"Sitemap {url} returned {resp.status_code}, retrying with cloudscraper")
+
+    return scraper.get(url, stream=True, timeout=20)
+
+def process_sitemap(url, needs_cloudscraper=False):
+    """逐条产出 sitemap 里的有效 URL（生成器），出错时记录日志并停止"""
     try:
-        scraper = cloudscraper.create_scraper()
-        resp = scraper.get(url, timeout=20)
-        resp.raise_for_status()
+        with open_sitemap(url, needs_cloudscraper) as resp:
+            resp.raise_for_status()
 
-        content = resp.content
-        if content[:2] == b"\x1f\x8b":
-            content = gzip.decompress(content)
+            # iter_content 会处理 Content-Encoding，这里拿到的就是响应体本身
+            chunks = resp.iter_content(chunk_size=READ_BUFFER_SIZE)
+            stream = io.BufferedReader(ChunkStream(chunks), buffer_size=READ_BUFFER_SIZE)
 
-        if b"<urlset" in content or b"<sitemapindex" in content:
-            return parse_xml(content)
-        else:
-            return parse_txt(content.decode("utf-8", errors="ignore"))
+            # .xml.gz 这类文件本身就是 gzip，边读边解压
+            magic, stream = read_head(stream, len(GZIP_MAGIC))
+            if magic == GZIP_MAGIC:
+                stream = io.BufferedReader(gzip.open(stream), buffer_size=READ_BUFFER_SIZE)
+
+            head, stream = read_head(stream, READ_BUFFER_SIZE, SITEMAP_TAGS)
+            if is_xml_sitemap(head):
+                yield from parse_xml(stream)
+            else:
+                yield from parse_txt(io.TextIOWrapper(stream, encoding="utf-8", errors="ignore"))
 
     except Exception as e:
         logging.error(f"Sitemap error {url}: {e}")
-        return []
 
-def parse_xml(content):
-    soup = BeautifulSoup(content, "xml")
-    urls = []
+def collect_sitemap(url, needs_cloudscraper=False):
+    # 在线程池里把下载 + 解析跑完，主线程只拿到过滤后的 URL
+    return list(process_sitemap(url, needs_cloudscraper))
+
+def parse_xml(stream):
+    """
+    流式解析：iterparse 只在 </loc> 结束时回调，
+    处理完立刻清掉已解析的节点，内存里始终只保留很小的一段树
+    """
+    for _, elem in etree.iterparse(stream, events=("end",), tag="{*}loc", recover=True):
+        raw = (elem.text or "").strip()
+
+        # 释放当前 <loc> 以及之前已处理完的 <url> 兄弟节点
+        elem.clear()
+        parent = elem.getparent()
+        if parent is not None:
+            while parent.getprevious() is not None:
+                del parent.getparent()[0]
 
-    for loc in soup.find_all("loc"):
-        raw = loc.get_text().strip()
         if not raw:
             continue
 
         u = normalize_url(raw)
         if is_valid_game_url(u):
-            urls.append(u)
-
-    return urls
-
-def parse_txt(text):
-    urls = []
+            yield u
 
-    for line in text.splitlines():
+def parse_txt(lines):
+    for line in lines:
         line = line.strip()
         if not line.startswith("http"):
             continue
 
         u = normalize_url(line)
         if is_valid_game_url(u):
-            urls.append(u)
-
-    return urls
+            yield u
 
 # ================= 数据存储 =================
 def save_latest(site, urls):
@@ -160,50 +272,104 @@ def send_feishu(site, urls, config):
         }
     }
 
-    requests.post(webhook, json=payload, timeout=10)
+    post_card(webhook, payload)
 
 # ================= 清理历史 =================
 def cleanup(config):
     days = config.get("storage", {}).get("retention_days", 7)
     cutoff = datetime.now() - timedelta(days=days)
 
-    for d in Path("diff").glob("*"):
-        try:
-            date = datetime.strptime(d.name, "%Y%m%d")
+    if not os.path.isdir("diff"):
+        return
+
+    # scandir 的 DirEntry 自带类型信息，is_dir() 不用额外 stat
+    with os.scandir("diff") as entries:
+        for d in entries:
+            if not d.is_dir():
+                continue
+            try:
+                date = datetime.strptime(d.name, "%Y%m%d")
+            except ValueError:
+                continue
             if date < cutoff:
-                for f in d.glob("*"):
-                    f.unlink()
-                d.rmdir()
-        except Exception:
-            pass
+                shutil.rmtree(d.path, ignore_errors=True)
+
+# ================= 趋势信号 =================
+def run_signals(config):
+    signals_cfg = config.get("signals", {}) or {}
+    if not signals_cfg.get("enabled"):
+        return
+
+    items = []
+
+    youtube = signals_cfg.get("youtube_search_rss", {}) or {}
+    if youtube.get("active"):
+        items.extend(fetch_youtube_items(youtube.get("queries", []), youtube.get("max_items", 30)))
+
+    reddit = signals_cfg.get("reddit_rss", {}) or {}
+    feed_state = None
+    if reddit.get("active"):
+        reddit_items, feed_state = fetch_reddit_items_with_state(
+            reddit.get("feeds", []), reddit.get("max_items", 50), load_feed_state()
+        )
+        items.extend(reddit_items)
+
+    candidates = build_signal_candidates(items, config.get("rules", {}) or {})
+    logging.info(f"Signals: {len(items)} items, {len(candidates)} candidates")
+
+    # 候选通知成功后才落盘 feed 状态；中途失败下次会重新拿到这些条目
+    if notify_candidates(config, "📈 趋势信号候选", candidates) and feed_state is not None:
+        save_feed_state(feed_state)
 
 # ================= 主流程 =================
 def main():
     config = load_config()
+    sites = [s for s in config.get("sites", []) if s.get("active")]
+
+    # 所有站点的 sitemap 一次性提交到线程池并发抓取，按站点顺序取结果
+    sitemap_urls = {}
+    # 每个 sitemap 还有几个站点要用；归零后立刻释放它的结果
+    pending = Counter()
+    for site in sites:
+        for sm in dict.fromkeys(site.get("sitemap_urls", [])):
+            sitemap_urls.setdefault(sm, site.get("needs_cloudscraper", False))
+            pending[sm] += 1
+    workers = max(1, min(MAX_WORKERS, len(sitemap_urls)))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            sm: executor.submit(collect_sitemap, sm, needs_cloudscraper)
+            for sm, needs_cloudscraper in sitemap_urls.items()
+        }
 
-    for site in config.get("sites", []):
-        if not site.get("active"):
-            continue
+        for site in sites:
+            name = site["name"]
+            logging.info(f"Processing {name}")
 
-        name = site["name"]
-        logging.info(f"Processing {name}")
+            # 边合并边去重（保持顺序），不再先拼出完整的 all_urls
+            seen = set()
+            current = []
+            for sm in dict.fromkeys(site.get("sitemap_urls", [])):
+                for u in futures[sm].result():
+                    if u not in seen:
+                        seen.add(u)
+                        current.append(u)
 
-        all_urls = []
-        for sm in site.get("sitemap_urls", []):
-            all_urls.extend(process_sitemap(sm))
+                pending[sm] -= 1
+                if not pending[sm]:
+                    del futures[sm]
 
-        # 去重（保持顺序）
-        current = list(dict.fromkeys(all_urls))
-        last = load_latest(name)
+            last = load_latest(name)
 
-        new_urls = [u for u in current if u not in last]
+            new_urls = [u for u in current if u not in last]
 
-        save_latest(name, current)
+            save_latest(name, current)
 
-        if new_urls:
-            save_diff(name, new_urls)
-            send_feishu(name, new_urls, config)
+            if new_urls:
+                save_diff(name, new_urls)
+                send_feishu(name, new_urls, config)
 
+    run_signals(config)
     cleanup(config)
 
 if __name__ == "__main__":
@@ -1,20 +1,31 @@
 # signals.py
 import re
+from functools import lru_cache
 from urllib.parse import urlparse
 
+import ahocorasick
+
 STOPWORDS = set([
     "the","a","an","and","or","to","of","in","on","for","with",
     "this","that","is","are","was","were","game","games","play"
 ])
 
-def normalize_keyword(s: str) -> str:
-    s = s.strip().lower()
-    s = re.sub(r"[\[\]\(\)\{\}<>\"'“”‘’]", " ", s)
-    s = re.sub(r"[^a-z0-9\s\-]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+# 非 [a-z0-9-] 的连续字符（括号、引号、标点、空白）统一压成一个空格
+_NON_KEYWORD_RE = re.compile(r"[^a-z0-9\-]+")
 
-def extract_candidates_from_title(title: str):
+# 连续大写开头词（比如 "Crazy Cattle 3D"）
+_CAPS_RE = re.compile(r"\b[A-Z][a-z0-9]+(?:\s+[A-Z0-9][a-z0-9]+){0,3}\b")
+
+@lru_cache(maxsize=8192)
+def normalize_keyword(s: str) -> str:
+    # 快速路径：纯 ASCII 字母数字 + 空格，只需转小写、合并空格
+    if s.isascii() and s.replace(" ", "").isalnum():
+        return " ".join(s.lower().split())
+    # 一次 sub 同时完成：去括号/引号、去标点、合并空白
+    return _NON_KEYWORD_RE.sub(" ", s.lower()).strip()
+
+@lru_cache(maxsize=8192)
+def extract_candidates_from_title(title: str) -> tuple:
     """
     极简提词：
     - 从标题里找可能的“游戏名片段”
@@ -22,16 +33,15 @@ def extract_candidates_from_title(title: str):
     - 也保留整句的清洗版本作为兜底
     """
     if not title:
-        return []
+        return ()
 
     # 兜底：整句（清洗后）
     base = normalize_keyword(title)
     candidates = [base] if base else []
 
     # 尝试：从原句抓 “连续大写开头词” （比如 "Crazy Cattle 3D"）
-    caps = re.findall(r"\b([A-Z][a-z0-9]+(?:\s+[A-Z0-9][a-z0-9]+){0,3})\b", title)
-    for c in caps:
-        cc = normalize_keyword(c)
+    for m in _CAPS_RE.finditer(title):
+        cc = normalize_keyword(m.group())
         if cc and len(cc) >= 3:
             candidates.append(cc)
 
@@ -43,21 +53,63 @@ def extract_candidates_from_title(title: str):
             continue
         seen.add(c)
         out.append(c)
-    return out
+    # 返回 tuple：结果会被缓存共享，调用方只读
+    return tuple(out)
 
-def score_item(text: str, rules: dict) -> int:
+# 合并时用位掩码记录命中过哪些来源；已知来源的位固定（只读），
+# 其他来源在每次 build_signal_candidates 调用内部临时分配
+SOURCES = ("reddit", "youtube")
+SOURCE_BITS = {s: 1 << i for i, s in enumerate(SOURCES)}
+
+DENY = "deny"
+BOOST = "boost"
+
+def build_keyword_automaton(rules: dict):
+    """
+    把 deny / boost 关键词编进同一个 Aho-Corasick 自动机，
+    每个标题只需扫描一遍就能拿到全部命中
+    """
+    automaton = ahocorasick.Automaton()
+
+    # 配置里重复 / 大小写不同的 boost 词各算一次，和逐个 in 判断一致
+    boost_counts = {}
+    for k in rules.get("boost_keywords", []):
+        k = k.lower()
+        boost_counts[k] = boost_counts.get(k, 0) + 1
+    for k, n in boost_counts.items():
+        automaton.add_word(k, (BOOST, k, n))
+
+    # deny 后加：同一个词两边都配置时以淘汰为准
+    for k in rules.get("deny_keywords", []):
+        automaton.add_word(k.lower(), (DENY, k.lower(), 0))
+    if len(automaton):
+        automaton.make_automaton()
+    return automaton
+
+def score_item(text: str, rules: dict, automaton=None) -> int:
     t = (text or "").lower()
     score = 0
 
-    deny = [x.lower() for x in rules.get("deny_keywords", [])]
-    boost = [x.lower() for x in rules.get("boost_keywords", [])]
+    # 空关键词：原来的 "" in t 恒为真（deny 全部淘汰，boost 每条 +3），
+    # 但 Aho-Corasick 会忽略空串，这里单独按原语义处理
+    if "" in rules.get("deny_keywords", []):
+        return -999
+    score += 3 * rules.get("boost_keywords", []).count("")
 
-    if any(k in t for k in deny):
-        return -999  # 直接淘汰
+    if automaton is None:
+        automaton = build_keyword_automaton(rules)
+    # 本次调用用的来源位表：拷一份，未知来源第一次出现时分配下一个空闲位
+    source_bits = dict(SOURCE_BITS)
 
-    for k in boost:
-        if k in t:
-            score += 3
+    boosted = {}
+    if len(automaton):
+        for _, (kind, k, n) in automaton.iter(t):
+            if kind == DENY:
+                return -999  # 直接淘汰
+            boosted[k] = n
+
+    # 标题里同一个词出现多次只算一次，按配置里出现的次数计分
+    score += 3 * sum(boosted.values())
 
     # 标题里含 “play online / browser” 这类词加分
     if "play online" in t or "browser" in t:
@@ -77,15 +129,26 @@ def build_signal_candidates(items, rules):
     }
     """
     threshold = rules.get("score_threshold", 6)
-    out = []
+    automaton = build_keyword_automaton(rules)
+    # 本次调用用的来源位表：拷一份，未知来源第一次出现时分配下一个空闲位
+    source_bits = dict(SOURCE_BITS)
+
+    # 边生成边合并同词：取最高分 + 合并来源
+    merged = {}
 
     for it in items:
         title = it.get("title", "")
         link = it.get("link", "")
-        s = score_item(title, rules)
+        s = score_item(title, rules, automaton)
         if s < 0:
             continue
 
+        source = it.get("source")
+        bit = source_bits.get(source)
+        if bit is None:
+            bit = source_bits[source] = 1 << len(source_bits)
+        evidence_title = title[:160]
+
         for kw in extract_candidates_from_title(title):
             # 很短/停用词过滤
             if len(kw) < 6:
@@ -94,31 +157,34 @@ def build_signal_candidates(items, rules):
             if len(tokens) < 1:
                 continue
 
-            out.append({
-                "keyword": kw,
-                "score": s,
-                "source": it.get("source"),
-                "evidence_title": title[:160],
-                "evidence_link": link
-            })
+            m = merged.get(kw)
+            if m is None:
+                merged[kw] = {
+                    "keyword": kw,
+                    "score": s,
+                    "source": source,
+                    "evidence_title": evidence_title,
+                    "evidence_link": link,
+                    "sources_mask": bit
+                }
+                continue
+
+            m["sources_mask"] |= bit
+            if s > m["score"]:
+                m["score"] = s
+                m["source"] = source
+                m["evidence_title"] = evidence_title
+                m["evidence_link"] = link
 
-    # 合并同词：取最高分 + 合并来源
-    merged = {}
-    for c in out:
-        k = c["keyword"]
-        if k not in merged:
-            merged[k] = {**c, "sources": {c["source"]}}
-        else:
-            merged[k]["sources"].add(c["source"])
-            if c["score"] > merged[k]["score"]:
-                merged[k].update({**c})
     final = []
-    for k, v in merged.items():
-        v["sources"] = sorted(list(v["sources"]))
+    for v in merged.values():
+        mask = v.pop("sources_mask")
         # 多来源命中加权（更像趋势）
-        if len(v["sources"]) >= 2:
+        if bin(mask).count("1") >= 2:
             v["score"] += 2
         if v["score"] >= threshold:
+            # 只对最终输出的候选还原成来源名列表
+            v["sources"] = sorted(s for s, bit in source_bits.items() if mask & bit)
             final.append(v)
 
     # 分数高的先推
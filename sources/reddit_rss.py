@@ -1,16 +1,88 @@
 # sources/reddit_rss.py
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import feedparser
 
+# 并发拉取 RSS 的线程数上限
+MAX_WORKERS = 8
+
+# 每个 feed 的 ETag / Last-Modified / 条目指纹，跟 latest/ 一起持久化
+FEED_STATE_PATH = "latest/feed_state.json"
+
+def load_feed_state(path=FEED_STATE_PATH):
+    p = Path(path)
+    if not p.exists():
+        return {}
+    try:
+        return json.loads(p.read_text(encoding="utf-8")) or {}
+    except ValueError:
+        return {}
+
+def save_feed_state(state, path=FEED_STATE_PATH):
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    p.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+
+def entries_hash(entries):
+    h = hashlib.sha1()
+    for e in entries:
+        h.update((getattr(e, "id", "") or getattr(e, "link", "") or "").encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
 def fetch_reddit_items(feeds, max_items=50):
-    items = []
-    for url in feeds:
-        feed = feedparser.parse(url)
-        for e in feed.entries[:max_items]:
-            items.append({
-                "source": "reddit",
-                "feed": url,
-                "title": getattr(e, "title", "") or "",
-                "link": getattr(e, "link", "") or "",
-                "published": getattr(e, "published", "") or ""
-            })
+    items, _ = fetch_reddit_items_with_state(feeds, max_items)
     return items
+
+def fetch_reddit_items_with_state(feeds, max_items=50, state=None):
+    """
+    带条件请求的版本，返回 (items, new_state)
+    new_state 不会自动落盘：调用方处理完候选（打分、通知）后
+    再 save_feed_state(new_state)，避免中途失败时条目被永久标记为已读
+    """
+    state = dict(state or {})
+    items = []
+    if not feeds:
+        return items, state
+
+    def parse(url):
+        # 带上次的 ETag / Last-Modified 做条件请求，没变化时服务端直接回 304
+        prev = state.get(url, {})
+        return feedparser.parse(url, etag=prev.get("etag"), modified=prev.get("modified"))
+
+    # feedparser.parse 是同步阻塞的，所有 feed 一起丢进线程池
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(feeds))) as executor:
+        parsed = executor.map(parse, feeds)
+
+        for url, feed in zip(feeds, parsed):
+            if feed.get("status") == 304:
+                continue
+
+            entries = feed.entries[:max_items]
+            if not entries:
+                continue
+
+            # 服务端没回 304，但条目其实没变，同样跳过
+            digest = entries_hash(entries)
+            unchanged = state.get(url, {}).get("entries_hash") == digest
+            state[url] = {
+                "etag": feed.get("etag"),
+                "modified": feed.get("modified"),
+                "entries_hash": digest
+            }
+            if unchanged:
+                continue
+
+            for e in entries:
+                items.append({
+                    "source": "reddit",
+                    "feed": url,
+                    "title": getattr(e, "title", "") or "",
+                    "link": getattr(e, "link", "") or "",
+                    "published": getattr(e, "published", "") or ""
+                })
+
+    return items, state
@@ -0,0 +1,84 @@
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import main
+
+LOCS = [f"https://example.com/games/g{i}" for i in range(2000)]
+
+XML_CHUNKS = [
+    b'<?xml version="1.0" encoding="UTF-8"?>\n',
+    b"<!-- generated sitemap -->\n",
+    b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+    b"".join(f"<url><loc>{u}</loc></url>".encode() for u in LOCS),
+    b"</urlset>",
+]
+
+def split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+BODIES = {
+    "/chunked.xml": XML_CHUNKS,
+    # gzip 数据切成小块，解压后第一次 read 只能拿到很短的一段
+    "/chunked.xml.gz": split(gzip.compress(b"".join(XML_CHUNKS)), 16),
+    "/sitemap.txt": [b"https://example.com/games/a\n", b"https://example.com/games/b\n"],
+}
+
+class ChunkedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        chunks = BODIES.get(self.path)
+        if chunks is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ChunkedHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+
+@pytest.mark.parametrize("path", ["/chunked.xml", "/chunked.xml.gz"])
+def test_chunked_xml_sitemap(server, path):
+    assert main.collect_sitemap(server + path) == LOCS
+
+def test_txt_sitemap(server):
+    assert main.collect_sitemap(server + "/sitemap.txt") == [
+        "https://example.com/games/a",
+        "https://example.com/games/b",
+    ]
+
+def test_main_shares_sitemap_between_sites(server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "config.yaml").write_text(
+        "sites:\n"
+        f"  - name: A\n    sitemap_urls: ['{server}/chunked.xml', '{server}/chunked.xml']\n    active: true\n"
+        f"  - name: B\n    sitemap_urls: ['{server}/chunked.xml', '{server}/sitemap.txt']\n    active: true\n",
+        encoding="utf-8",
+    )
+
+    main.main()
+
+    assert (tmp_path / "latest" / "A.txt").read_text(encoding="utf-8").splitlines() == LOCS
+    assert (tmp_path / "latest" / "B.txt").read_text(encoding="utf-8").splitlines() == LOCS + [
+        "https://example.com/games/a",
+        "https://example.com/games/b",
+    ]